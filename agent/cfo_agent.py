@@ -1,72 +1,26 @@
 """
 Main CFO Copilot Agent
 """
+import functools
+import os
+import threading
+from collections import OrderedDict
 from typing import Tuple, Any
 from .intent_classifier import IntentClassifier, IntentType
-from .financial_analyzer import FinancialAnalyzer, format_currency
+from .financial_analyzer import FinancialAnalyzer, KPI_BLOCK_TMPL, kpi_fields
 from .data_loader import FinancialDataLoader
 
-class CFOAgent:
-    """Main CFO Copilot Agent that processes queries and returns responses"""
-    
-    def __init__(self, data_file: str = "data.xlsx"):
-        self.data_loader = FinancialDataLoader(data_file)
-        self.intent_classifier = IntentClassifier()
-        self.analyzer = FinancialAnalyzer(self.data_loader)
-    
-    def process_query(self, query: str) -> Tuple[str, Any]:
-        """Process a user query and return response with chart"""
-        try:
-            # Classify intent
-            intent, params = self.intent_classifier.classify(query)
-            
-            # Route to appropriate analyzer
-            if intent == IntentType.REVENUE_VS_BUDGET:
-                return self.analyzer.analyze_revenue_vs_budget(params.get('month'))
-            
-            elif intent == IntentType.GROSS_MARGIN_TREND:
-                return self.analyzer.analyze_gross_margin_trend(params.get('time_period', 'last_3_months'))
-            
-            elif intent == IntentType.OPEX_BREAKDOWN:
-                return self.analyzer.analyze_opex_breakdown(params.get('month'))
-            
-            elif intent == IntentType.CASH_RUNWAY:
-                return self.analyzer.analyze_cash_runway()
-            
-            elif intent == IntentType.EBITDA_ANALYSIS:
-                return self.analyzer.analyze_ebitda(params.get('month'))
-            
-            else:
-                # General query - provide overview
-                return self._handle_general_query(query)
-                
-        except Exception as e:
-            return f"Sorry, I encountered an error processing your query: {str(e)}", None
-    
-    def _handle_general_query(self, query: str) -> Tuple[str, Any]:
-        """Handle general queries with a summary overview"""
-        try:
-            summary = self.data_loader.get_monthly_summary()
-            runway_data = self.data_loader.get_cash_runway()
-            
-            # Calculate variances for overview
-            revenue_variance = summary['revenue_actual'] - summary['revenue_budget']
-            revenue_variance_pct = (revenue_variance / summary['revenue_budget'] * 100) if summary['revenue_budget'] > 0 else 0
-            
-            ebitda_variance = summary['ebitda_actual'] - summary['ebitda_budget']
-            ebitda_variance_pct = (ebitda_variance / summary['ebitda_budget'] * 100) if summary['ebitda_budget'] > 0 else 0
-            
-            response = f"""**Financial Overview (Latest Month)**
-
-• **Revenue:** {format_currency(summary['revenue_actual'])} actual&nbsp;vs&nbsp;{format_currency(summary['revenue_budget'])} budget  
-  - Variance: {format_currency(revenue_variance)} ({revenue_variance_pct:+.1f}%)
+QUERY_CACHE_SIZE = 256
 
-• **Gross Margin:** {summary['gross_margin_actual']:.1f}% actual&nbsp;vs&nbsp;{summary['gross_margin_budget']:.1f}% budget
+@functools.lru_cache(maxsize=4)
+def _get_loader(path: str, mtime: float) -> FinancialDataLoader:
+    """One loader per (data file, mtime), shared by every agent in the process"""
+    return FinancialDataLoader(path)
 
-• **EBITDA:** {format_currency(summary['ebitda_actual'])} actual&nbsp;vs&nbsp;{format_currency(summary['ebitda_budget'])} budget  
-  - Variance: {format_currency(ebitda_variance)} ({ebitda_variance_pct:+.1f}%)
+# General-query response, filled from kpi_fields(summary) plus runway_months
+OVERVIEW_TMPL = "**Financial Overview (Latest Month)**\n\n" + KPI_BLOCK_TMPL + """
 
-• **Cash Runway:** {runway_data['runway_months']:.1f} months
+• **Cash Runway:** {runway_months:.1f} months
 
 **Available Analyses:**
 
@@ -82,8 +36,75 @@ class CFOAgent:
 
 Try asking: "What was June 2025 revenue vs budget?" or "Show me gross margin trends"
 """
-            
-            return response.strip(), None
-            
+
+class CFOAgent:
+    """Main CFO Copilot Agent that processes queries and returns responses"""
+    
+    def __init__(self, data_file: str = "data.xlsx"):
+        path = os.path.abspath(data_file)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        self.data_loader = _get_loader(path, mtime)
+        self.intent_classifier = IntentClassifier()
+        self.analyzer = FinancialAnalyzer(self.data_loader)
+        # Normalized query -> (response, chart), least recently used first. The agent is
+        # bound to one loader (one data file version), so the query alone is the key.
+        # The agent may be shared by several Streamlit sessions, hence the lock.
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+    
+    def process_query(self, query: str) -> Tuple[str, Any]:
+        """Process a user query and return response with chart"""
+        cache_key = query.strip().lower()
+        with self._query_cache_lock:
+            result = self._query_cache.get(cache_key)
+            if result is not None:
+                self._query_cache.move_to_end(cache_key)
+                return result
+        
+        try:
+            result = self._route_query(query)
         except Exception as e:
-            return f"Sorry, I couldn't generate a summary: {str(e)}", None
+            return f"Sorry, I encountered an error processing your query: {str(e)}", None
+        
+        with self._query_cache_lock:
+            self._query_cache[cache_key] = result
+            if len(self._query_cache) > QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return result
+    
+    def _route_query(self, query: str) -> Tuple[str, Any]:
+        """Classify the query and dispatch it to the matching analyzer"""
+        # Classify intent
+        intent, params = self.intent_classifier.classify(query)
+        
+        # Route to appropriate analyzer
+        if intent == IntentType.REVENUE_VS_BUDGET:
+            return self.analyzer.analyze_revenue_vs_budget(params.get('month'))
+        
+        elif intent == IntentType.GROSS_MARGIN_TREND:
+            return self.analyzer.analyze_gross_margin_trend(params.get('time_period', 'last_3_months'))
+        
+        elif intent == IntentType.OPEX_BREAKDOWN:
+            return self.analyzer.analyze_opex_breakdown(params.get('month'))
+        
+        elif intent == IntentType.CASH_RUNWAY:
+            return self.analyzer.analyze_cash_runway()
+        
+        elif intent == IntentType.EBITDA_ANALYSIS:
+            return self.analyzer.analyze_ebitda(params.get('month'))
+        
+        else:
+            # General query - provide overview
+            return self._handle_general_query(query)
+    
+    def _handle_general_query(self, query: str) -> Tuple[str, Any]:
+        """Handle general queries with a summary overview"""
+        summary = self.data_loader.get_monthly_summary()
+        runway_data = self.data_loader.get_cash_runway()
+        
+        response = OVERVIEW_TMPL.format_map({
+            **kpi_fields(summary),
+            'runway_months': runway_data['runway_months']
+        })
+        
+        return response.strip(), None
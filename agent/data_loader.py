@@ -1,9 +1,31 @@
 """
 Data loading utilities for CFO Copilot
 """
+import numpy as np
 import pandas as pd
 import os
-from typing import Dict, Any
+import glob
+import shutil
+import stat
+import tempfile
+import threading
+from typing import Dict, Any, Tuple
+
+def _runway(cash: np.ndarray) -> Tuple[float, float, float]:
+    """Runway, average monthly burn over the last 3 months, and current cash"""
+    # Mean of the last n month-over-month drops telescopes to one subtraction
+    n = min(3, len(cash) - 1)
+    current_cash = cash[-1]
+    avg_monthly_burn = (cash[-1 - n] - current_cash) / n
+    runway_months = current_cash / avg_monthly_burn if avg_monthly_burn > 0 else 0
+    return runway_months, avg_monthly_burn, current_cash
+
+# Columns of actuals/budget that the analyzers use; the rest are dropped at load
+LEDGER_COLUMNS = ['month', 'account_category', 'amount']
+
+# Sheets kept sorted by month so a month can be sliced by binary search; actuals and
+# budget are only read through their (month, category) aggregates, which groupby sorts
+MONTH_SORTED_SHEETS = ('cash',)
 
 class FinancialDataLoader:
     """Loads and processes financial data from Excel files"""
@@ -11,19 +33,214 @@ class FinancialDataLoader:
     def __init__(self, data_file: str = "data.xlsx"):
         self.data_file = data_file
         self._data_cache = {}
+        self._agg_actual = None
+        self._agg_budget = None
+        self._pivot_actual = None
+        self._pivot_budget = None
+        self._opex_mask = np.zeros(0, dtype=bool)
+        self._cash_arr = np.empty(0, dtype=np.float64)
+        self._month_index = {}
+        self._load_lock = threading.Lock()
+        # Parquet copies of the sheets live next to the workbook, keyed by its mtime
+        self.cache_dir = None
+        if os.path.exists(data_file):
+            data_dir = os.path.dirname(os.path.abspath(data_file))
+            cache_name = f"{os.path.basename(data_file)}-{os.stat(data_file).st_mtime_ns}"
+            self.cache_dir = os.path.join(data_dir, ".cache", cache_name)
         
     def load_all_data(self) -> Dict[str, pd.DataFrame]:
-        """Load all sheets from the Excel file"""
-        if not self._data_cache:
-            try:
-                xl_file = pd.ExcelFile(self.data_file)
-                for sheet_name in xl_file.sheet_names:
-                    self._data_cache[sheet_name] = pd.read_excel(self.data_file, sheet_name=sheet_name)
-            except Exception as e:
-                raise Exception(f"Error loading data file {self.data_file}: {str(e)}")
+        """Load all sheets from the Parquet cache, falling back to the Excel file"""
+        if self._data_cache:
+            return self._data_cache
+        with self._load_lock:
+            if not self._data_cache:
+                try:
+                    # Build everything locally and publish _data_cache last, so a failed
+                    # or in-progress load is never mistaken for a finished one
+                    data = self._read_sheets()
+                    self._slim_ledgers(data)
+                    opex_mask = self._encode_categoricals(data)
+                    month_index = self._sort_by_month(data)
+                    agg_actual, agg_budget, pivot_actual, pivot_budget = self._build_aggregates(data)
+                    cash_arr = self._build_cash_array(data)
+                except Exception as e:
+                    raise Exception(f"Error loading data file {self.data_file}: {str(e)}")
+                
+                self._opex_mask = opex_mask
+                self._month_index = month_index
+                self._agg_actual, self._agg_budget = agg_actual, agg_budget
+                self._pivot_actual, self._pivot_budget = pivot_actual, pivot_budget
+                self._cash_arr = cash_arr
+                self._data_cache = data
         
         return self._data_cache
     
+    @staticmethod
+    def _slim_ledgers(data: Dict[str, pd.DataFrame]):
+        """Drop unused actuals/budget columns and downcast amounts to the smallest exact dtype"""
+        for sheet_name in ('actuals', 'budget'):
+            df = data.get(sheet_name)
+            if df is None or df.empty:
+                continue
+            df = df[[c for c in LEDGER_COLUMNS if c in df.columns]].copy()
+            if 'amount' in df.columns:
+                downcast = 'integer' if pd.api.types.is_integer_dtype(df['amount']) else 'float'
+                df['amount'] = pd.to_numeric(df['amount'], downcast=downcast)
+            data[sheet_name] = df
+    
+    @staticmethod
+    def _encode_categoricals(data: Dict[str, pd.DataFrame]) -> np.ndarray:
+        """Store month and account_category of actuals/budget as shared categorical dtypes
+        
+        Returns a mask that is True for each account_category code that is an Opex line.
+        """
+        frames = [data[name] for name in ('actuals', 'budget')
+                  if name in data and not data[name].empty]
+        if not frames:
+            return np.zeros(0, dtype=bool)
+        
+        dtypes = {}
+        for column in ('month', 'account_category'):
+            values = pd.concat([df[column].astype(str) for df in frames]).unique()
+            dtypes[column] = pd.CategoricalDtype(sorted(values))
+            for df in frames:
+                df[column] = df[column].astype(str).astype(dtypes[column])
+        
+        categories = dtypes['account_category'].categories
+        return np.asarray(categories.str.startswith('Opex:'), dtype=bool)
+    
+    @staticmethod
+    def _sort_by_month(data: Dict[str, pd.DataFrame]) -> Dict[str, np.ndarray]:
+        """Sort month-keyed sheets by month and return their month arrays"""
+        month_index = {}
+        for sheet_name in MONTH_SORTED_SHEETS:
+            df = data.get(sheet_name)
+            if df is None or df.empty or 'month' not in df.columns:
+                continue
+            df = df.sort_values('month', kind='stable').reset_index(drop=True)
+            data[sheet_name] = df
+            month_index[sheet_name] = df['month'].astype(str).to_numpy()
+        return month_index
+    
+    def _slice(self, sheet_name: str, month: str) -> pd.DataFrame:
+        """Rows of a month-sorted sheet for one month, found by binary search"""
+        df = self._data_cache.get(sheet_name, pd.DataFrame())
+        months = self._month_index.get(sheet_name)
+        if months is None:
+            return df.iloc[:0]
+        left = np.searchsorted(months, month, side='left')
+        right = np.searchsorted(months, month, side='right')
+        return df.iloc[left:right]
+    
+    def _opex_totals(self, totals: pd.Series) -> pd.Series:
+        """Restrict per-category totals to the Opex categories"""
+        if totals.empty:
+            return totals
+        return totals[self._opex_mask[totals.index.codes]]
+    
+    @classmethod
+    def _build_aggregates(cls, data: Dict[str, pd.DataFrame]) -> Tuple[pd.Series, pd.Series, pd.DataFrame, pd.DataFrame]:
+        """Pre-aggregate actuals and budget amounts by (month, account_category)"""
+        agg_actual = cls._aggregate(data.get('actuals', pd.DataFrame()))
+        agg_budget = cls._aggregate(data.get('budget', pd.DataFrame()))
+        # Month x category tables for vectorized per-month metrics
+        return agg_actual, agg_budget, agg_actual.unstack(fill_value=0), agg_budget.unstack(fill_value=0)
+    
+    @staticmethod
+    def _build_cash_array(data: Dict[str, pd.DataFrame]) -> np.ndarray:
+        """Month-ordered cash balances as a float64 array for runway math"""
+        # The cash sheet is already sorted by month in _sort_by_month
+        cash = data.get('cash', pd.DataFrame())
+        if cash.empty:
+            return np.empty(0, dtype=np.float64)
+        return cash['cash_usd'].to_numpy(dtype=np.float64)
+    
+    @staticmethod
+    def _aggregate(df: pd.DataFrame) -> pd.Series:
+        """Sum amounts by (month, account_category)"""
+        if df.empty:
+            index = pd.MultiIndex.from_arrays([[], []], names=['month', 'account_category'])
+            return pd.Series([], index=index, name='amount', dtype=float)
+        # Accumulate in 64-bit regardless of the downcast storage dtype
+        wide = np.int64 if pd.api.types.is_integer_dtype(df['amount']) else np.float64
+        amounts = df['amount'].astype(wide)
+        return amounts.groupby([df['month'], df['account_category']], sort=True, observed=True).sum()
+    
+    @staticmethod
+    def _category_totals(agg: pd.Series, month: str = None) -> pd.Series:
+        """Totals by account_category for one month, or across all months"""
+        if not month:
+            return agg.groupby(level='account_category', observed=True).sum()
+        if month not in agg.index.get_level_values('month'):
+            return agg.iloc[:0].droplevel('month')
+        return agg.xs(month, level='month')
+    
+    def get_category_pivot(self, source: str = 'actuals') -> pd.DataFrame:
+        """Get amounts by month (rows) and account_category (columns) for actuals or budget"""
+        self.load_all_data()
+        return self._pivot_actual if source == 'actuals' else self._pivot_budget
+    
+    def _read_workbook(self) -> Dict[str, pd.DataFrame]:
+        """Read every sheet in one call, preferring the Rust-based calamine engine"""
+        try:
+            return pd.read_excel(self.data_file, sheet_name=None, engine="calamine")
+        except (ImportError, ValueError):
+            # python-calamine missing, or pandas too old to know the engine
+            return pd.read_excel(self.data_file, sheet_name=None, engine="openpyxl")
+    
+    def _read_sheets(self) -> Dict[str, pd.DataFrame]:
+        """Read every sheet from the Parquet cache, or from the workbook and cache it"""
+        if self.cache_dir and os.path.isdir(self.cache_dir):
+            try:
+                return self._read_parquet_cache()
+            except Exception:
+                # Unreadable cache; drop it so the workbook read below can rewrite it
+                shutil.rmtree(self.cache_dir, ignore_errors=True)
+        data = self._read_workbook()
+        self._write_parquet_cache(data)
+        return data
+    
+    def _read_parquet_cache(self) -> Dict[str, pd.DataFrame]:
+        """Read every cached sheet back from its Parquet file"""
+        data = {}
+        for path in sorted(glob.glob(os.path.join(self.cache_dir, "*.parquet"))):
+            sheet_name = os.path.splitext(os.path.basename(path))[0]
+            data[sheet_name] = pd.read_parquet(path)
+        return data
+    
+    def _write_parquet_cache(self, data: Dict[str, pd.DataFrame]):
+        """Persist the loaded sheets as Parquet; caching is best-effort"""
+        if not self.cache_dir:
+            return
+        tmp_dir = None
+        try:
+            parent = os.path.dirname(self.cache_dir)
+            os.makedirs(parent, exist_ok=True)
+            # Write into a scratch dir and rename so readers never see a partial cache
+            tmp_dir = tempfile.mkdtemp(dir=parent)
+            for sheet_name, df in data.items():
+                df.to_parquet(os.path.join(tmp_dir, f"{sheet_name}.parquet"), compression="zstd")
+            # mkdtemp creates the dir as 0700; give it the umask-derived mode of its parent
+            os.chmod(tmp_dir, stat.S_IMODE(os.stat(parent).st_mode))
+            os.rename(tmp_dir, self.cache_dir)
+            tmp_dir = None
+            self._prune_stale_caches()
+        except Exception:
+            # e.g. pyarrow missing, a read-only dir, or a mixed-type object column
+            # (ArrowTypeError); the sheets are simply not cached
+            pass
+        finally:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+    
+    def _prune_stale_caches(self):
+        """Remove cache dirs left behind by earlier versions of the workbook"""
+        prefix = os.path.basename(self.cache_dir).rsplit("-", 1)[0] + "-"
+        for path in glob.glob(os.path.join(os.path.dirname(self.cache_dir), glob.escape(prefix) + "*")):
+            suffix = os.path.basename(path)[len(prefix):]
+            if path != self.cache_dir and suffix.isdigit():
+                shutil.rmtree(path, ignore_errors=True)
+    
     def get_actuals(self) -> pd.DataFrame:
         """Get actuals data"""
         data = self.load_all_data()
@@ -46,23 +263,21 @@ class FinancialDataLoader:
     
     def get_monthly_summary(self, month: str = None) -> Dict[str, Any]:
         """Get monthly financial summary"""
-        actuals = self.get_actuals()
-        budget = self.get_budget()
         cash = self.get_cash()
+        totals_actual = self._category_totals(self._agg_actual, month)
+        totals_budget = self._category_totals(self._agg_budget, month)
         
         if month:
-            actuals = actuals[actuals['month'] == month]
-            budget = budget[budget['month'] == month]
-            cash = cash[cash['month'] == month]
+            cash = self._slice('cash', month)
         
         # Calculate metrics
         summary = {
-            'revenue_actual': actuals[actuals['account_category'] == 'Revenue']['amount'].sum(),
-            'revenue_budget': budget[budget['account_category'] == 'Revenue']['amount'].sum(),
-            'cogs_actual': actuals[actuals['account_category'] == 'COGS']['amount'].sum(),
-            'cogs_budget': budget[budget['account_category'] == 'COGS']['amount'].sum(),
-            'opex_actual': actuals[actuals['account_category'].str.startswith('Opex:')]['amount'].sum(),
-            'opex_budget': budget[budget['account_category'].str.startswith('Opex:')]['amount'].sum(),
+            'revenue_actual': totals_actual.get('Revenue', 0),
+            'revenue_budget': totals_budget.get('Revenue', 0),
+            'cogs_actual': totals_actual.get('COGS', 0),
+            'cogs_budget': totals_budget.get('COGS', 0),
+            'opex_actual': self._opex_totals(totals_actual).sum(),
+            'opex_budget': self._opex_totals(totals_budget).sum(),
             'cash': cash['cash_usd'].iloc[-1] if not cash.empty else 0
         }
         
@@ -76,51 +291,33 @@ class FinancialDataLoader:
     
     def get_opex_breakdown(self, month: str = None) -> pd.DataFrame:
         """Get Opex breakdown by category"""
-        actuals = self.get_actuals()
-        budget = self.get_budget()
-        
-        if month:
-            actuals = actuals[actuals['month'] == month]
-            budget = budget[budget['month'] == month]
+        self.load_all_data()
         
-        # Filter for Opex categories
-        opex_actuals = actuals[actuals['account_category'].str.startswith('Opex:')]
-        opex_budget = budget[budget['account_category'].str.startswith('Opex:')]
+        # Opex totals by category from the pre-aggregated amounts
+        opex_actuals_agg = self._opex_totals(self._category_totals(self._agg_actual, month))
+        opex_budget_agg = self._opex_totals(self._category_totals(self._agg_budget, month))
         
-        # Aggregate by category (sum amounts for each category)
-        opex_actuals_agg = opex_actuals.groupby('account_category')['amount'].sum().reset_index()
-        opex_budget_agg = opex_budget.groupby('account_category')['amount'].sum().reset_index()
-        
-        # Merge actuals and budget
-        opex_breakdown = pd.merge(
-            opex_actuals_agg.rename(columns={'amount': 'actual'}),
-            opex_budget_agg.rename(columns={'amount': 'budget'}),
-            on='account_category',
-            how='outer'
-        ).fillna(0)
+        # Align actuals and budget on the union of categories
+        categories = opex_actuals_agg.index.union(opex_budget_agg.index)
+        opex_breakdown = pd.DataFrame({
+            'actual': opex_actuals_agg.reindex(categories, fill_value=0),
+            'budget': opex_budget_agg.reindex(categories, fill_value=0)
+        }).rename_axis('account_category').reset_index()
         
         opex_breakdown['variance'] = opex_breakdown['actual'] - opex_breakdown['budget']
-        opex_breakdown['variance_pct'] = (opex_breakdown['variance'] / opex_breakdown['budget'] * 100).fillna(0)
+        budget = opex_breakdown['budget'].where(opex_breakdown['budget'] > 0)
+        opex_breakdown['variance_pct'] = (opex_breakdown['variance'] / budget * 100).fillna(0)
         
         return opex_breakdown
     
     def get_cash_runway(self) -> Dict[str, Any]:
         """Calculate cash runway based on average monthly burn"""
-        cash_data = self.get_cash()
+        self.load_all_data()
         
-        if len(cash_data) < 3:
+        if len(self._cash_arr) < 3:
             return {'runway_months': 0, 'avg_monthly_burn': 0, 'current_cash': 0}
         
-        # Calculate monthly burn (negative change in cash)
-        cash_data = cash_data.sort_values('month')
-        cash_data['monthly_burn'] = cash_data['cash_usd'].diff() * -1
-        
-        # Average burn over last 3 months
-        last_3_months = cash_data.tail(3)
-        avg_monthly_burn = last_3_months['monthly_burn'].mean()
-        current_cash = cash_data['cash_usd'].iloc[-1]
-        
-        runway_months = current_cash / avg_monthly_burn if avg_monthly_burn > 0 else 0
+        runway_months, avg_monthly_burn, current_cash = _runway(self._cash_arr)
         
         return {
             'runway_months': runway_months,
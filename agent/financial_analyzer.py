@@ -1,16 +1,68 @@
 """
 Financial analysis functions for CFO Copilot
 """
+import math
+import operator
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 from plotly.subplots import make_subplots
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, Callable
 from .data_loader import FinancialDataLoader
 
-def format_currency(amount: float) -> str:
-    """Return an HTML-safe USD string that avoids MathJax ($...$) parsing in Streamlit."""
-    return f"&#36;{amount:,.0f}"
+SUMMARY_CATEGORIES = ['Revenue', 'COGS', 'Opex', 'EBITDA']
+KEYS_ACTUAL = ('revenue_actual', 'cogs_actual', 'opex_actual', 'ebitda_actual')
+KEYS_BUDGET = ('revenue_budget', 'cogs_budget', 'opex_budget', 'ebitda_budget')
+
+# HTML-safe USD string that avoids MathJax ($...$) parsing in Streamlit
+format_currency: Callable[[float], str] = "&#36;{:,.0f}".format
+
+# Response templates; *_usd fields take amounts already passed through format_currency.
+# KPI_BLOCK_TMPL is shared by the revenue vs budget and general overview responses and
+# is filled from kpi_fields(summary).
+KPI_BLOCK_TMPL = """• **Revenue:** {revenue_actual_usd} actual&nbsp;vs&nbsp;{revenue_budget_usd} budget  
+  - Variance: {revenue_variance_usd} ({revenue_variance_pct:+.1f}%)
+
+• **Gross Margin:** {gross_margin_actual:.1f}% actual&nbsp;vs&nbsp;{gross_margin_budget:.1f}% budget
+
+• **EBITDA:** {ebitda_actual_usd} actual&nbsp;vs&nbsp;{ebitda_budget_usd} budget  
+  - Variance: {ebitda_variance_usd} ({ebitda_variance_pct:+.1f}%)"""
+
+REVENUE_VS_BUDGET_TMPL = "**Revenue vs Budget Analysis {period}**\n\n" + KPI_BLOCK_TMPL + """
+
+Summary: Revenue was {revenue_direction} budget by {revenue_variance_abs_usd}; gross margin is {gm_trend} vs plan ({gm_delta_pp:+.1f} pp); EBITDA finished {ebitda_direction} plan by {ebitda_variance_abs_usd}."""
+
+OPEX_CATEGORY_TMPL = "\n\n• **{}:** {} actual&nbsp;vs&nbsp;{} budget ({:+.1f}%)"
+
+def kpi_fields(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Template fields for KPI_BLOCK_TMPL, plus the raw revenue and EBITDA variances"""
+    revenue_variance = summary['revenue_actual'] - summary['revenue_budget']
+    revenue_variance_pct = (revenue_variance / summary['revenue_budget'] * 100) if summary['revenue_budget'] > 0 else 0
+    
+    ebitda_variance = summary['ebitda_actual'] - summary['ebitda_budget']
+    ebitda_variance_pct = (ebitda_variance / summary['ebitda_budget'] * 100) if summary['ebitda_budget'] > 0 else 0
+    
+    return {
+        'revenue_variance': revenue_variance,
+        'revenue_actual_usd': format_currency(summary['revenue_actual']),
+        'revenue_budget_usd': format_currency(summary['revenue_budget']),
+        'revenue_variance_usd': format_currency(revenue_variance),
+        'revenue_variance_pct': revenue_variance_pct,
+        'gross_margin_actual': summary['gross_margin_actual'],
+        'gross_margin_budget': summary['gross_margin_budget'],
+        'ebitda_variance': ebitda_variance,
+        'ebitda_actual_usd': format_currency(summary['ebitda_actual']),
+        'ebitda_budget_usd': format_currency(summary['ebitda_budget']),
+        'ebitda_variance_usd': format_currency(ebitda_variance),
+        'ebitda_variance_pct': ebitda_variance_pct,
+    }
+
+def gross_margin_pct(revenue: np.ndarray, cogs: np.ndarray) -> np.ndarray:
+    """Element-wise gross margin %; 0 where there is no revenue."""
+    margin = np.zeros_like(revenue)
+    np.divide(revenue - cogs, revenue, out=margin, where=revenue > 0)
+    return margin * 100
 
 def direction_word(value: float, up_word: str = "above", down_word: str = "below") -> str:
     """Small wording helper for narratives."""
@@ -27,11 +79,33 @@ def trend_word(delta: float) -> str:
         return "declining"
     return "flat"
 
+# (comparator, threshold, label) tiers, checked in order; a value gets the label of the
+# first tier it satisfies, and the last tier is the catch-all
+STATUS_TIERS = (
+    (operator.gt, 12, "🟢 Healthy"),
+    (operator.gt, 6, "🟡 Monitor"),
+    (operator.gt, -math.inf, "🔴 Critical"),
+)
+
+def tier_label(tiers: Tuple[Tuple[Callable[[float, float], bool], float, str], ...], value: float) -> str:
+    """Label of the first tier whose comparison with its threshold the value satisfies"""
+    return next((label for compare, threshold, label in tiers if compare(value, threshold)), tiers[-1][-1])
+
+def runway_status(runway_months: float) -> str:
+    """Status indicator for a cash runway"""
+    return tier_label(STATUS_TIERS, runway_months)
+
 class FinancialAnalyzer:
     """Performs financial analysis and generates charts"""
     
     def __init__(self, data_loader: FinancialDataLoader):
         self.data_loader = data_loader
+        # Chart layouts are validated once here and shared by every figure built from them
+        self._tmpl_rev_vs_bud = go.Layout(xaxis_title='Category', yaxis_title='Amount (USD)', barmode='group', height=400)
+        self._tmpl_gm_trend = go.Layout(xaxis_title='Month', yaxis_title='Gross Margin (%)', height=400)
+        self._tmpl_opex = go.Layout(xaxis_title='Category', yaxis_title='Amount (USD)', barmode='group', height=400)
+        self._tmpl_cash = go.Layout(title='Cash Balance Trend', xaxis_title='Month', yaxis_title='Cash (USD)', height=400)
+        self._tmpl_ebitda = go.Layout(xaxis_title='Category', yaxis_title='Amount (USD)', height=400)
     
     def analyze_revenue_vs_budget(self, month: str = None) -> Tuple[str, go.Figure]:
         """Analyze revenue vs budget for a specific month or overall"""
@@ -43,131 +117,93 @@ class FinancialAnalyzer:
             title = "Revenue vs Budget - Latest Month"
         
         # Create comparison chart
-        fig = go.Figure()
-        
-        categories = ['Revenue', 'COGS', 'Opex', 'EBITDA']
-        actual_values = [
-            summary['revenue_actual'],
-            summary['cogs_actual'],
-            summary['opex_actual'],
-            summary['ebitda_actual']
-        ]
-        budget_values = [
-            summary['revenue_budget'],
-            summary['cogs_budget'],
-            summary['opex_budget'],
-            summary['ebitda_budget']
-        ]
-        
-        fig.add_trace(go.Bar(
-            name='Actual',
-            x=categories,
-            y=actual_values,
-            marker_color='#2E86AB'
-        ))
-        
-        fig.add_trace(go.Bar(
-            name='Budget',
-            x=categories,
-            y=budget_values,
-            marker_color='#A23B72'
-        ))
-        
-        fig.update_layout(
-            title=title,
-            xaxis_title='Category',
-            yaxis_title='Amount (USD)',
-            barmode='group',
-            height=400
-        )
+        categories = SUMMARY_CATEGORIES
+        actual_values = np.fromiter((summary[k] for k in KEYS_ACTUAL), dtype=np.float64, count=4)
+        budget_values = np.fromiter((summary[k] for k in KEYS_BUDGET), dtype=np.float64, count=4)
+        
+        fig = go.Figure(data=[
+            go.Bar(
+                name='Actual',
+                x=categories,
+                y=actual_values,
+                marker_color='#2E86AB'
+            ),
+            go.Bar(
+                name='Budget',
+                x=categories,
+                y=budget_values,
+                marker_color='#A23B72'
+            )
+        ], layout=self._tmpl_rev_vs_bud)
+        fig.layout.title.text = title
         
         # Generate text response
-        revenue_variance = summary['revenue_actual'] - summary['revenue_budget']
-        revenue_variance_pct = (revenue_variance / summary['revenue_budget'] * 100) if summary['revenue_budget'] > 0 else 0
-        
-        ebitda_variance = summary['ebitda_actual'] - summary['ebitda_budget']
-        ebitda_variance_pct = (ebitda_variance / summary['ebitda_budget'] * 100) if summary['ebitda_budget'] > 0 else 0
-        
+        fields = kpi_fields(summary)
+        revenue_variance = fields['revenue_variance']
+        ebitda_variance = fields['ebitda_variance']
         gm_delta_pp = summary['gross_margin_actual'] - summary['gross_margin_budget']
 
-        response = f"""**Revenue vs Budget Analysis {'for ' + month if month else '(Latest Month)'}**
-
-• **Revenue:** {format_currency(summary['revenue_actual'])} actual&nbsp;vs&nbsp;{format_currency(summary['revenue_budget'])} budget  
-  - Variance: {format_currency(revenue_variance)} ({revenue_variance_pct:+.1f}%)
-
-• **Gross Margin:** {summary['gross_margin_actual']:.1f}% actual&nbsp;vs&nbsp;{summary['gross_margin_budget']:.1f}% budget
-
-• **EBITDA:** {format_currency(summary['ebitda_actual'])} actual&nbsp;vs&nbsp;{format_currency(summary['ebitda_budget'])} budget  
-  - Variance: {format_currency(ebitda_variance)} ({ebitda_variance_pct:+.1f}%)
-
-Summary: Revenue was {direction_word(revenue_variance)} budget by {format_currency(abs(revenue_variance))}; gross margin is {trend_word(gm_delta_pp/100)} vs plan ({gm_delta_pp:+.1f} pp); EBITDA finished {direction_word(ebitda_variance)} plan by {format_currency(abs(ebitda_variance))}."""
+        response = REVENUE_VS_BUDGET_TMPL.format_map({
+            **fields,
+            'period': 'for ' + month if month else '(Latest Month)',
+            'revenue_variance_abs_usd': format_currency(abs(revenue_variance)),
+            'revenue_direction': direction_word(revenue_variance),
+            'ebitda_variance_abs_usd': format_currency(abs(ebitda_variance)),
+            'ebitda_direction': direction_word(ebitda_variance),
+            'gm_delta_pp': gm_delta_pp,
+            'gm_trend': trend_word(gm_delta_pp/100)
+        })
         
         return response.strip(), fig
     
     def analyze_gross_margin_trend(self, time_period: str = "last_3_months") -> Tuple[str, go.Figure]:
         """Analyze gross margin trend over time"""
-        actuals = self.data_loader.get_actuals()
-        budget = self.data_loader.get_budget()
+        # Months with actuals, in sorted order
+        all_months = self.data_loader.get_category_pivot('actuals').index
         
         # Get recent months based on time period
         if time_period == "last_3_months":
-            months = actuals['month'].unique()[-3:]
+            months = all_months[-3:]
         elif time_period == "last_6_months":
-            months = actuals['month'].unique()[-6:]
+            months = all_months[-6:]
         elif time_period == "last_12_months":
-            months = actuals['month'].unique()[-12:]
+            months = all_months[-12:]
         else:
-            months = actuals['month'].unique()[-3:]  # Default to last 3 months
+            months = all_months[-3:]  # Default to last 3 months
         
-        # Calculate gross margin for each month
-        margin_data = []
-        for month in months:
-            month_actuals = actuals[actuals['month'] == month]
-            month_budget = budget[budget['month'] == month]
-            
-            revenue_actual = month_actuals[month_actuals['account_category'] == 'Revenue']['amount'].sum()
-            cogs_actual = month_actuals[month_actuals['account_category'] == 'COGS']['amount'].sum()
-            revenue_budget = month_budget[month_budget['account_category'] == 'Revenue']['amount'].sum()
-            cogs_budget = month_budget[month_budget['account_category'] == 'COGS']['amount'].sum()
-            
-            gross_margin_actual = (revenue_actual - cogs_actual) / revenue_actual * 100 if revenue_actual > 0 else 0
-            gross_margin_budget = (revenue_budget - cogs_budget) / revenue_budget * 100 if revenue_budget > 0 else 0
-            
-            margin_data.append({
-                'month': month,
-                'actual': gross_margin_actual,
-                'budget': gross_margin_budget
-            })
+        # Calculate gross margin for all months at once from the month x category pivots
+        columns = ['Revenue', 'COGS']
+        pivot_actual = self.data_loader.get_category_pivot('actuals').reindex(index=months, columns=columns, fill_value=0)
+        pivot_budget = self.data_loader.get_category_pivot('budget').reindex(index=months, columns=columns, fill_value=0)
+        actual = pivot_actual.to_numpy(dtype=np.float64)
+        budget = pivot_budget.to_numpy(dtype=np.float64)
         
-        df = pd.DataFrame(margin_data)
+        df = pd.DataFrame({
+            'month': months,
+            'actual': gross_margin_pct(actual[:, 0], actual[:, 1]),
+            'budget': gross_margin_pct(budget[:, 0], budget[:, 1])
+        })
         
         # Create trend chart
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=df['month'],
-            y=df['actual'],
-            mode='lines+markers',
-            name='Actual',
-            line=dict(color='#2E86AB', width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=df['month'],
-            y=df['budget'],
-            mode='lines+markers',
-            name='Budget',
-            line=dict(color='#A23B72', width=3, dash='dash'),
-            marker=dict(size=8)
-        ))
-        
-        fig.update_layout(
-            title=f'Gross Margin Trend - {time_period.replace("_", " ").title()}',
-            xaxis_title='Month',
-            yaxis_title='Gross Margin (%)',
-            height=400
-        )
+        fig = go.Figure(data=[
+            go.Scatter(
+                x=df['month'],
+                y=df['actual'],
+                mode='lines+markers',
+                name='Actual',
+                line=dict(color='#2E86AB', width=3),
+                marker=dict(size=8)
+            ),
+            go.Scatter(
+                x=df['month'],
+                y=df['budget'],
+                mode='lines+markers',
+                name='Budget',
+                line=dict(color='#A23B72', width=3, dash='dash'),
+                marker=dict(size=8)
+            )
+        ], layout=self._tmpl_gm_trend)
+        fig.layout.title.text = f'Gross Margin Trend - {time_period.replace("_", " ").title()}'
         
         # Generate text response
         latest_actual = df['actual'].iloc[-1]
@@ -199,33 +235,25 @@ Summary: Latest margin is {direction_word(latest_variance, 'above', 'below')} bu
         if opex_breakdown.empty:
             return "No Opex data available for the specified period.", go.Figure()
         
-        # Create breakdown chart
-        fig = go.Figure()
-        
         # Clean category names for display
         opex_breakdown['category_display'] = opex_breakdown['account_category'].str.replace('Opex:', '')
         
-        fig.add_trace(go.Bar(
-            x=opex_breakdown['category_display'],
-            y=opex_breakdown['actual'],
-            name='Actual',
-            marker_color='#2E86AB'
-        ))
-        
-        fig.add_trace(go.Bar(
-            x=opex_breakdown['category_display'],
-            y=opex_breakdown['budget'],
-            name='Budget',
-            marker_color='#A23B72'
-        ))
-        
-        fig.update_layout(
-            title=f'Opex Breakdown by Category {"- " + month if month else "(Latest Month)"}',
-            xaxis_title='Category',
-            yaxis_title='Amount (USD)',
-            barmode='group',
-            height=400
-        )
+        # Create breakdown chart
+        fig = go.Figure(data=[
+            go.Bar(
+                x=opex_breakdown['category_display'].to_numpy(),
+                y=opex_breakdown['actual'].to_numpy(),
+                name='Actual',
+                marker_color='#2E86AB'
+            ),
+            go.Bar(
+                x=opex_breakdown['category_display'].to_numpy(),
+                y=opex_breakdown['budget'].to_numpy(),
+                name='Budget',
+                marker_color='#A23B72'
+            )
+        ], layout=self._tmpl_opex)
+        fig.layout.title.text = f'Opex Breakdown by Category {"- " + month if month else "(Latest Month)"}'
         
         # Generate text response
         total_actual = opex_breakdown['actual'].sum()
@@ -241,12 +269,15 @@ Summary: Latest margin is {direction_word(latest_variance, 'above', 'below')} bu
 **By Category:**
 """
         
-        for _, row in opex_breakdown.iterrows():
-            response += (
-                f"\n\n• **{row['category_display']}:** "
-                f"{format_currency(row['actual'])} actual&nbsp;vs&nbsp;{format_currency(row['budget'])} "
-                f"budget ({row['variance_pct']:+.1f}%)"
+        response += "".join(
+            OPEX_CATEGORY_TMPL.format(category, format_currency(actual), format_currency(budget), variance_pct)
+            for category, actual, budget, variance_pct in zip(
+                opex_breakdown['category_display'].to_numpy(),
+                opex_breakdown['actual'].to_numpy(),
+                opex_breakdown['budget'].to_numpy(),
+                opex_breakdown['variance_pct'].to_numpy()
             )
+        )
         top_cat = opex_breakdown.sort_values('actual', ascending=False).iloc[0]
         response += (
             f"\n\nSummary: Total opex was {direction_word(total_variance, 'over', 'under')} budget by {format_currency(abs(total_variance))}. "
@@ -264,23 +295,16 @@ Summary: Latest margin is {direction_word(latest_variance, 'above', 'below')} bu
             return "No cash data available.", go.Figure()
         
         # Create cash trend chart
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=cash_data['month'],
-            y=cash_data['cash_usd'],
-            mode='lines+markers',
-            name='Cash Balance',
-            line=dict(color='#2E86AB', width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig.update_layout(
-            title='Cash Balance Trend',
-            xaxis_title='Month',
-            yaxis_title='Cash (USD)',
-            height=400
-        )
+        fig = go.Figure(data=[
+            go.Scatter(
+                x=cash_data['month'],
+                y=cash_data['cash_usd'],
+                mode='lines+markers',
+                name='Cash Balance',
+                line=dict(color='#2E86AB', width=3),
+                marker=dict(size=8)
+            )
+        ], layout=self._tmpl_cash)
         
         # Generate text response
         response = f"""**Cash Runway Analysis**
@@ -291,7 +315,7 @@ Summary: Latest margin is {direction_word(latest_variance, 'above', 'below')} bu
 
 • **Cash Runway:** {runway_data['runway_months']:.1f} months
 
-**Status**: {'🟢 Healthy' if runway_data['runway_months'] > 12 else '🟡 Monitor' if runway_data['runway_months'] > 6 else '🔴 Critical'}
+**Status**: {runway_status(runway_data['runway_months'])}
 
 Summary: With {format_currency(runway_data['current_cash'])} on hand and an average monthly burn of {format_currency(runway_data['avg_monthly_burn'])}, runway is approximately {runway_data['runway_months']:.1f} months."""
         
@@ -302,31 +326,21 @@ Summary: With {format_currency(runway_data['current_cash'])} on hand and an aver
         summary = self.data_loader.get_monthly_summary(month)
         
         # Create EBITDA waterfall chart
-        fig = go.Figure()
-        
-        categories = ['Revenue', 'COGS', 'Opex', 'EBITDA']
-        values = [
-            summary['revenue_actual'],
-            -summary['cogs_actual'],
-            -summary['opex_actual'],
-            summary['ebitda_actual']
-        ]
+        categories = SUMMARY_CATEGORIES
+        # COGS and Opex are shown as deductions
+        values = np.fromiter((summary[k] for k in KEYS_ACTUAL), dtype=np.float64, count=4) * [1, -1, -1, 1]
         colors = ['#2E86AB', '#A23B72', '#F18F01', '#C73E1D']
         
-        fig.add_trace(go.Bar(
-            x=categories,
-            y=values,
-            marker_color=colors,
-            text=[f'${v:,.0f}' for v in values],
-            textposition='auto'
-        ))
-        
-        fig.update_layout(
-            title=f'EBITDA Analysis {"- " + month if month else "(Latest Month)"}',
-            xaxis_title='Category',
-            yaxis_title='Amount (USD)',
-            height=400
-        )
+        fig = go.Figure(data=[
+            go.Bar(
+                x=categories,
+                y=values,
+                marker_color=colors,
+                text=[f'${v:,.0f}' for v in values],
+                textposition='auto'
+            )
+        ], layout=self._tmpl_ebitda)
+        fig.layout.title.text = f'EBITDA Analysis {"- " + month if month else "(Latest Month)"}'
         
         # Generate text response
         ebitda_variance = summary['ebitda_actual'] - summary['ebitda_budget']
@@ -13,6 +13,15 @@ class IntentType(Enum):
     EBITDA_ANALYSIS = "ebitda_analysis"
     GENERAL_QUERY = "general_query"
 
+# Month names and YYYY-MM dates in one pass; the leftmost mention wins
+_MONTH_RX = re.compile(
+    r'(?P<m01>january|jan)|(?P<m02>february|feb)|(?P<m03>march|mar)|(?P<m04>april|apr)'
+    r'|(?P<m05>may)|(?P<m06>june|jun)|(?P<m07>july|jul)|(?P<m08>august|aug)'
+    r'|(?P<m09>september|sep)|(?P<m10>october|oct)|(?P<m11>november|nov)|(?P<m12>december|dec)'
+    r'|(?P<iso>\d{4}-\d{2})'
+)
+_GROUP_TO_MONTH = {f'm{i:02d}': f'2023-{i:02d}' for i in range(1, 13)}
+
 class IntentClassifier:
     """Classifies user queries into specific intents"""
     
@@ -57,6 +66,25 @@ class IntentClassifier:
                 r"operating.*profit"
             ]
         }
+        
+        # Every pattern of an intent contains one of its trigger words, so an
+        # intent whose triggers are all absent cannot match and is skipped
+        self._triggers = {
+            IntentType.REVENUE_VS_BUDGET: ('budget',),
+            IntentType.GROSS_MARGIN_TREND: ('margin',),
+            IntentType.OPEX_BREAKDOWN: ('opex', 'expense'),
+            IntentType.CASH_RUNWAY: ('cash', 'runway'),
+            IntentType.EBITDA_ANALYSIS: ('ebitda', 'profit', 'earnings')
+        }
+        
+        # One alternation per intent, compiled once
+        self._compiled = {
+            intent_type: re.compile('|'.join(f'(?:{p})' for p in patterns))
+            for intent_type, patterns in self.patterns.items()
+        }
+        
+        self._last_months_pattern = re.compile(r'last\s+(\d+)\s+months?')
+        self._ytd_pattern = re.compile(r'year\s+to\s+date|ytd')
     
     def classify(self, query: str) -> Tuple[IntentType, Dict[str, str]]:
         """Classify user query and extract parameters"""
@@ -69,14 +97,15 @@ class IntentClassifier:
         time_period = self._extract_time_period(query_lower)
         
         # Check each intent pattern
-        for intent_type, patterns in self.patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, query_lower):
-                    return intent_type, {
-                        'month': month,
-                        'time_period': time_period,
-                        'original_query': query
-                    }
+        for intent_type, pattern in self._compiled.items():
+            if not any(word in query_lower for word in self._triggers[intent_type]):
+                continue
+            if pattern.search(query_lower):
+                return intent_type, {
+                    'month': month,
+                    'time_period': time_period,
+                    'original_query': query
+                }
         
         # Default to general query
         return IntentType.GENERAL_QUERY, {
@@ -87,44 +116,19 @@ class IntentClassifier:
     
     def _extract_month(self, query: str) -> str:
         """Extract month from query"""
-        month_patterns = {
-            r'january|jan': '2023-01',
-            r'february|feb': '2023-02',
-            r'march|mar': '2023-03',
-            r'april|apr': '2023-04',
-            r'may': '2023-05',
-            r'june|jun': '2023-06',
-            r'july|jul': '2023-07',
-            r'august|aug': '2023-08',
-            r'september|sep': '2023-09',
-            r'october|oct': '2023-10',
-            r'november|nov': '2023-11',
-            r'december|dec': '2023-12'
-        }
-        
-        for pattern, month in month_patterns.items():
-            if re.search(pattern, query):
-                return month
-        
-        # Check for YYYY-MM format
-        date_match = re.search(r'(\d{4}-\d{2})', query)
-        if date_match:
-            return date_match.group(1)
-        
-        return None
+        match = _MONTH_RX.search(query)
+        if not match:
+            return None
+        if match.lastgroup == 'iso':
+            return match.group('iso')
+        return _GROUP_TO_MONTH[match.lastgroup]
     
     def _extract_time_period(self, query: str) -> str:
         """Extract time period for trends"""
-        if re.search(r'last\s+(\d+)\s+months?', query):
-            match = re.search(r'last\s+(\d+)\s+months?', query)
+        match = self._last_months_pattern.search(query)
+        if match:
             return f"last_{match.group(1)}_months"
-        elif re.search(r'last\s+3\s+months?', query):
-            return "last_3_months"
-        elif re.search(r'last\s+6\s+months?', query):
-            return "last_6_months"
-        elif re.search(r'last\s+12\s+months?', query):
-            return "last_12_months"
-        elif re.search(r'year\s+to\s+date|ytd', query):
+        elif self._ytd_pattern.search(query):
             return "ytd"
         
         return None
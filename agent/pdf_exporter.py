@@ -3,15 +3,107 @@ PDF export functionality for CFO Copilot
 """
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.pdfgen import canvas
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
+import functools
 import io
-import base64
+import math
+import operator
+import pandas as pd
 from .data_loader import FinancialDataLoader
-from .financial_analyzer import FinancialAnalyzer
+from .financial_analyzer import FinancialAnalyzer, tier_label, runway_status
+
+# (table label, summary key prefix) for the key metrics table
+METRIC_ROWS = [('Revenue', 'revenue'), ('COGS', 'cogs'), ('Opex', 'opex'), ('EBITDA', 'ebitda')]
+
+# Recommendation tiers for tier_label, as (comparator, threshold, label)
+REVENUE_RECS = (
+    (operator.gt, 5, 'Continue current growth trajectory'),
+    (operator.ge, -5, 'Maintain current revenue levels'),
+    (operator.gt, -math.inf, 'Focus on revenue growth initiatives'),
+)
+EBITDA_RECS = (
+    (operator.ge, -10, 'Maintain current cost efficiency'),
+    (operator.gt, -math.inf, 'Optimize cost structure'),
+)
+CASH_RECS = (
+    (operator.ge, 12, 'Cash position is healthy'),
+    (operator.gt, -math.inf, 'Monitor cash burn closely'),
+)
+
+# Table look shared by the Platypus TableStyle and the canvas-drawn tables
+TABLE_HEADER_TEXT_COLOR = colors.whitesmoke
+TABLE_HEADER_FONT = 'Helvetica-Bold'
+TABLE_HEADER_FONT_SIZE = 12
+TABLE_BODY_COLOR = colors.beige
+TABLE_BODY_TEXT_COLOR = colors.black
+TABLE_BODY_FONT = 'Helvetica'
+TABLE_BODY_FONT_SIZE = 10
+TABLE_GRID_COLOR = colors.black
+TABLE_GRID_WIDTH = 1
+
+# Page geometry for canvas-drawn reports, matching the SimpleDocTemplate margins
+PAGE_WIDTH, PAGE_HEIGHT = A4
+LEFT_X = 72
+TOP_Y = PAGE_HEIGHT - 72
+BOTTOM_Y = 18
+HEADER_ROW_HEIGHT = 30
+BODY_ROW_HEIGHT = 18
+
+@functools.lru_cache(maxsize=8)
+def _table_style(header_hex: str) -> TableStyle:
+    """Shared table style with a colored header row"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_hex)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), TABLE_HEADER_TEXT_COLOR),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), TABLE_HEADER_FONT),
+        ('FONTSIZE', (0, 0), (-1, 0), TABLE_HEADER_FONT_SIZE),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), TABLE_BODY_COLOR),
+        ('TEXTCOLOR', (0, 1), (-1, -1), TABLE_BODY_TEXT_COLOR),
+        ('FONTNAME', (0, 1), (-1, -1), TABLE_BODY_FONT),
+        ('FONTSIZE', (0, 1), (-1, -1), TABLE_BODY_FONT_SIZE),
+        ('GRID', (0, 0), (-1, -1), TABLE_GRID_WIDTH, TABLE_GRID_COLOR)
+    ])
+
+def _draw_table(c: canvas.Canvas, x: float, y: float, rows: List[List[str]],
+                col_widths: List[float], header_color: str) -> float:
+    """Draw a gridded table with its top-left corner at (x, y); returns the y below it"""
+    header, body = rows[0], rows[1:]
+    width = sum(col_widths)
+    
+    def draw_row(row, y, height, fill, text_color, font, size):
+        c.setFillColor(fill)
+        c.setStrokeColor(TABLE_GRID_COLOR)
+        c.setLineWidth(TABLE_GRID_WIDTH)
+        c.rect(x, y - height, width, height, stroke=1, fill=1)
+        c.setFillColor(text_color)
+        c.setFont(font, size)
+        left = x
+        for cell, w in zip(row, col_widths):
+            c.line(left, y, left, y - height)
+            c.drawCentredString(left + w / 2, y - height / 2 - size / 3, cell)
+            left += w
+        return y - height
+    
+    def draw_header(y):
+        return draw_row(header, y, HEADER_ROW_HEIGHT, colors.HexColor(header_color),
+                        TABLE_HEADER_TEXT_COLOR, TABLE_HEADER_FONT, TABLE_HEADER_FONT_SIZE)
+    
+    y = draw_header(y)
+    for row in body:
+        # Carry the table over to a fresh page, repeating the header
+        if y - BODY_ROW_HEIGHT < BOTTOM_Y:
+            c.showPage()
+            y = draw_header(TOP_Y)
+        y = draw_row(row, y, BODY_ROW_HEIGHT, TABLE_BODY_COLOR, TABLE_BODY_TEXT_COLOR,
+                     TABLE_BODY_FONT, TABLE_BODY_FONT_SIZE)
+    return y
 
 class PDFExporter:
     """Export financial reports to PDF"""
@@ -49,54 +141,171 @@ class PDFExporter:
             alignment=TA_LEFT
         ))
     
-    def export_executive_summary(self) -> bytes:
-        """Export executive summary to PDF"""
+    @staticmethod
+    def _variance_row(label: str, key: str, summary: Dict[str, Any]) -> Tuple[List[str], float]:
+        """Metrics table row for one summary metric, plus its variance %"""
+        actual = summary[f'{key}_actual']
+        budget = summary[f'{key}_budget']
+        variance = actual - budget
+        variance_pct = variance / budget * 100 if budget else 0.0
+        return [label, f"${actual:,.0f}", f"${budget:,.0f}", f"${variance:,.0f}", f"{variance_pct:+.1f}%"], variance_pct
+    
+    def _metrics_rows(self, summary: Dict[str, Any]) -> Tuple[List[List[str]], Dict[str, float]]:
+        """Key metrics table rows, plus the variance % of each metric"""
+        metrics_data = [['Metric', 'Actual', 'Budget', 'Variance', 'Variance %']]
+        variance_pcts = {}
+        for label, key in METRIC_ROWS:
+            row, variance_pcts[key] = self._variance_row(label, key, summary)
+            metrics_data.append(row)
+        return metrics_data, variance_pcts
+    
+    def _opex_rows(self, opex_breakdown: pd.DataFrame) -> List[List[str]]:
+        """Opex breakdown table rows"""
+        opex_data = [['Category', 'Actual', 'Budget', 'Variance %']]
+        # Format each column in one pass, then zip into table rows
+        cats = opex_breakdown['account_category'].astype(str).str.replace('Opex:', '', regex=False).to_numpy()
+        fmt_act = opex_breakdown['actual'].map('${:,.0f}'.format).to_numpy()
+        fmt_bud = opex_breakdown['budget'].map('${:,.0f}'.format).to_numpy()
+        fmt_vp = opex_breakdown['variance_pct'].map('{:+.1f}%'.format).to_numpy()
+        opex_data += list(map(list, zip(cats, fmt_act, fmt_bud, fmt_vp)))
+        return opex_data
+    
+    def _summary_lines(self, variance_pcts: Dict[str, float],
+                       runway_data: Dict[str, Any]) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """Performance (label, text) lines and recommendations for the summary section"""
+        revenue_variance_pct = variance_pcts['revenue']
+        ebitda_variance_pct = variance_pcts['ebitda']
+        
+        performance = [
+            ("Revenue Performance", f"{'Above budget' if revenue_variance_pct > 0 else 'Below budget'} by {abs(revenue_variance_pct):.1f}%"),
+            ("EBITDA Performance", f"{'Above budget' if ebitda_variance_pct > 0 else 'Below budget'} by {abs(ebitda_variance_pct):.1f}%"),
+            ("Cash Position", f"{runway_data['runway_months']:.1f} months runway"),
+        ]
+        recommendations = [
+            tier_label(REVENUE_RECS, revenue_variance_pct),
+            tier_label(EBITDA_RECS, ebitda_variance_pct),
+            tier_label(CASH_RECS, runway_data['runway_months']),
+        ]
+        return performance, recommendations
+    
+    def export_executive_summary(self, summary: Dict[str, Any] = None, runway: Dict[str, Any] = None,
+                                 opex: pd.DataFrame = None, use_canvas: bool = True) -> bytes:
+        """Export executive summary to PDF, using precomputed data where given
+        
+        The fixed-shape summary is drawn straight onto a canvas; pass
+        use_canvas=False to lay it out with SimpleDocTemplate instead.
+        """
         buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
         
-        # Build the PDF content
+        # Get financial data
+        summary = summary if summary is not None else self.data_loader.get_monthly_summary()
+        runway_data = runway if runway is not None else self.data_loader.get_cash_runway()
+        opex_breakdown = opex if opex is not None else self.data_loader.get_opex_breakdown()
+        
+        if use_canvas:
+            c = canvas.Canvas(buffer, pagesize=A4)
+            self._draw_exec_summary(c, summary, runway_data, opex_breakdown)
+            c.save()
+        else:
+            doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+            doc.build(self._exec_summary_story(summary, runway_data, opex_breakdown))
+        buffer.seek(0)
+        return buffer.getvalue()
+    
+    def _draw_exec_summary(self, c: canvas.Canvas, summary: Dict[str, Any], runway_data: Dict[str, Any],
+                           opex_breakdown: pd.DataFrame):
+        """Draw the executive summary directly onto a canvas"""
+        y = TOP_Y
+        
+        def ensure_space(height):
+            nonlocal y
+            if y - height < BOTTOM_Y:
+                c.showPage()
+                y = TOP_Y
+        
+        def section(title):
+            nonlocal y
+            ensure_space(48)
+            y -= 30
+            c.setFillColor(colors.HexColor('#A23B72'))
+            c.setFont('Helvetica-Bold', 16)
+            c.drawString(LEFT_X, y, title)
+            y -= 18
+        
+        def label_value(label, value, size=14, leading=18):
+            nonlocal y
+            ensure_space(leading)
+            y -= leading
+            c.setFillColor(colors.black)
+            c.setFont('Helvetica-Bold', size)
+            c.drawString(LEFT_X, y, label)
+            c.setFont('Helvetica', size)
+            c.drawString(LEFT_X + c.stringWidth(label, 'Helvetica-Bold', size), y, value)
+        
+        def table(rows, col_widths, header_color):
+            nonlocal y
+            ensure_space(HEADER_ROW_HEIGHT + BODY_ROW_HEIGHT)
+            # Center the table between the margins, as Platypus does
+            x = (PAGE_WIDTH - sum(col_widths)) / 2
+            y = _draw_table(c, x, y, rows, col_widths, header_color)
+        
+        # Title
+        y -= 24
+        c.setFillColor(colors.HexColor('#2E86AB'))
+        c.setFont('Helvetica-Bold', 24)
+        c.drawCentredString(PAGE_WIDTH / 2, y, "CFO Executive Summary")
+        y -= 20
+        
+        # Key Metrics Section
+        section("Key Financial Metrics")
+        metrics_data, variance_pcts = self._metrics_rows(summary)
+        table(metrics_data, [1.5*inch, 1.2*inch, 1.2*inch, 1.2*inch, 1*inch], '#2E86AB')
+        
+        # Gross Margin Section
+        section("Gross Margin Analysis")
+        label_value("Actual Gross Margin: ", f"{summary['gross_margin_actual']:.1f}%")
+        label_value("Budget Gross Margin: ", f"{summary['gross_margin_budget']:.1f}%")
+        label_value("Variance: ", f"{summary['gross_margin_actual'] - summary['gross_margin_budget']:+.1f} percentage points")
+        
+        # Opex Breakdown Section
+        if not opex_breakdown.empty:
+            section("Opex Breakdown by Category")
+            table(self._opex_rows(opex_breakdown), [2*inch, 1.5*inch, 1.5*inch, 1*inch], '#A23B72')
+        
+        # Cash Runway Section
+        section("Cash Runway Analysis")
+        label_value("Current Cash: ", f"${runway_data['current_cash']:,.0f}")
+        label_value("Average Monthly Burn: ", f"${runway_data['avg_monthly_burn']:,.0f}")
+        label_value("Cash Runway: ", f"{runway_data['runway_months']:.1f} months")
+        label_value("Status: ", runway_status(runway_data['runway_months']))
+        
+        # Summary and Recommendations
+        section("Summary & Recommendations")
+        performance, recommendations = self._summary_lines(variance_pcts, runway_data)
+        for label, text in performance:
+            label_value(f"{label}: ", text, size=10, leading=12)
+        y -= 12
+        label_value("Key Recommendations:", "", size=10, leading=12)
+        for rec in recommendations:
+            label_value("", f"• {rec}", size=10, leading=12)
+    
+    def _exec_summary_story(self, summary: Dict[str, Any], runway_data: Dict[str, Any],
+                            opex_breakdown: pd.DataFrame) -> List[Any]:
+        """Platypus flowables for the executive summary"""
         story = []
         
         # Title
         story.append(Paragraph("CFO Executive Summary", self.styles['CustomTitle']))
         story.append(Spacer(1, 20))
         
-        # Get financial data
-        summary = self.data_loader.get_monthly_summary()
-        runway_data = self.data_loader.get_cash_runway()
-        opex_breakdown = self.data_loader.get_opex_breakdown()
-        
         # Key Metrics Section
         story.append(Paragraph("Key Financial Metrics", self.styles['SectionHeader']))
         
         # Create metrics table
-        metrics_data = [
-            ['Metric', 'Actual', 'Budget', 'Variance', 'Variance %'],
-            ['Revenue', f"${summary['revenue_actual']:,.0f}", f"${summary['revenue_budget']:,.0f}", 
-             f"${summary['revenue_actual'] - summary['revenue_budget']:,.0f}", 
-             f"{(summary['revenue_actual'] - summary['revenue_budget']) / summary['revenue_budget'] * 100:+.1f}%"],
-            ['COGS', f"${summary['cogs_actual']:,.0f}", f"${summary['cogs_budget']:,.0f}", 
-             f"${summary['cogs_actual'] - summary['cogs_budget']:,.0f}", 
-             f"{(summary['cogs_actual'] - summary['cogs_budget']) / summary['cogs_budget'] * 100:+.1f}%"],
-            ['Opex', f"${summary['opex_actual']:,.0f}", f"${summary['opex_budget']:,.0f}", 
-             f"${summary['opex_actual'] - summary['opex_budget']:,.0f}", 
-             f"{(summary['opex_actual'] - summary['opex_budget']) / summary['opex_budget'] * 100:+.1f}%"],
-            ['EBITDA', f"${summary['ebitda_actual']:,.0f}", f"${summary['ebitda_budget']:,.0f}", 
-             f"${summary['ebitda_actual'] - summary['ebitda_budget']:,.0f}", 
-             f"{(summary['ebitda_actual'] - summary['ebitda_budget']) / summary['ebitda_budget'] * 100:+.1f}%"]
-        ]
+        metrics_data, variance_pcts = self._metrics_rows(summary)
         
         metrics_table = Table(metrics_data, colWidths=[1.5*inch, 1.2*inch, 1.2*inch, 1.2*inch, 1*inch])
-        metrics_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+        metrics_table.setStyle(_table_style('#2E86AB'))
         
         story.append(metrics_table)
         story.append(Spacer(1, 20))
@@ -112,27 +321,8 @@ class PDFExporter:
         if not opex_breakdown.empty:
             story.append(Paragraph("Opex Breakdown by Category", self.styles['SectionHeader']))
             
-            opex_data = [['Category', 'Actual', 'Budget', 'Variance %']]
-            for _, row in opex_breakdown.iterrows():
-                category = row['account_category'].replace('Opex:', '')
-                opex_data.append([
-                    category,
-                    f"${row['actual']:,.0f}",
-                    f"${row['budget']:,.0f}",
-                    f"{row['variance_pct']:+.1f}%"
-                ])
-            
-            opex_table = Table(opex_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1*inch])
-            opex_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#A23B72')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            opex_table = Table(self._opex_rows(opex_breakdown), colWidths=[2*inch, 1.5*inch, 1.5*inch, 1*inch])
+            opex_table.setStyle(_table_style('#A23B72'))
             
             story.append(opex_table)
             story.append(Spacer(1, 20))
@@ -144,12 +334,7 @@ class PDFExporter:
         story.append(Paragraph(f"<b>Cash Runway:</b> {runway_data['runway_months']:.1f} months", self.styles['MetricValue']))
         
         # Status indicator
-        if runway_data['runway_months'] > 12:
-            status = "🟢 Healthy"
-        elif runway_data['runway_months'] > 6:
-            status = "🟡 Monitor"
-        else:
-            status = "🔴 Critical"
+        status = runway_status(runway_data['runway_months'])
         
         story.append(Paragraph(f"<b>Status:</b> {status}", self.styles['MetricValue']))
         story.append(Spacer(1, 20))
@@ -158,29 +343,16 @@ class PDFExporter:
         story.append(Paragraph("Summary & Recommendations", self.styles['SectionHeader']))
         
         # Generate summary based on performance
-        revenue_variance_pct = (summary['revenue_actual'] - summary['revenue_budget']) / summary['revenue_budget'] * 100
-        ebitda_variance_pct = (summary['ebitda_actual'] - summary['ebitda_budget']) / summary['ebitda_budget'] * 100
-        
-        summary_text = f"""
-        <b>Revenue Performance:</b> {'Above budget' if revenue_variance_pct > 0 else 'Below budget'} by {abs(revenue_variance_pct):.1f}%
-        <br/><b>EBITDA Performance:</b> {'Above budget' if ebitda_variance_pct > 0 else 'Below budget'} by {abs(ebitda_variance_pct):.1f}%
-        <br/><b>Cash Position:</b> {runway_data['runway_months']:.1f} months runway
-        <br/><br/>
-        <b>Key Recommendations:</b>
-        <br/>• {'Continue current growth trajectory' if revenue_variance_pct > 5 else 'Focus on revenue growth initiatives' if revenue_variance_pct < -5 else 'Maintain current revenue levels'}
-        <br/>• {'Optimize cost structure' if ebitda_variance_pct < -10 else 'Maintain current cost efficiency'}
-        <br/>• {'Monitor cash burn closely' if runway_data['runway_months'] < 12 else 'Cash position is healthy'}
-        """
+        performance, recommendations = self._summary_lines(variance_pcts, runway_data)
+        summary_text = "<br/>".join(f"<b>{label}:</b> {text}" for label, text in performance)
+        summary_text += "<br/><br/><b>Key Recommendations:</b>"
+        summary_text += "".join(f"<br/>• {rec}" for rec in recommendations)
         
         story.append(Paragraph(summary_text, self.styles['Normal']))
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
-        return buffer.getvalue()
+        return story
     
-    def export_cash_trend_report(self) -> bytes:
-        """Export cash trend analysis to PDF"""
+    def export_cash_trend_report(self, runway: Dict[str, Any] = None) -> bytes:
+        """Export cash trend analysis to PDF, using a precomputed runway where given"""
         buffer = io.BytesIO()
         doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
         
@@ -192,7 +364,7 @@ class PDFExporter:
         
         # Get cash data
         cash_data = self.data_loader.get_cash()
-        runway_data = self.data_loader.get_cash_runway()
+        runway_data = runway if runway is not None else self.data_loader.get_cash_runway()
         
         if not cash_data.empty:
             # Cash trend table
@@ -202,30 +374,15 @@ class PDFExporter:
             recent_cash = cash_data.tail(12) if len(cash_data) > 12 else cash_data
             
             cash_table_data = [['Month', 'Cash Balance (USD)', 'Monthly Change']]
-            for _, row in recent_cash.iterrows():
-                change = row['cash_usd'] - recent_cash[recent_cash['month'] == row['month']].iloc[0]['cash_usd'] if len(recent_cash) > 1 else 0
-                if len(recent_cash) > 1:
-                    prev_month = recent_cash[recent_cash['month'] < row['month']]
-                    if not prev_month.empty:
-                        change = row['cash_usd'] - prev_month.iloc[-1]['cash_usd']
-                
-                cash_table_data.append([
-                    str(row['month']),
-                    f"${row['cash_usd']:,.0f}",
-                    f"${change:,.0f}" if change != 0 else "$0"
-                ])
+            # Month-over-month change within the shown window; the first month has none
+            months = recent_cash['month'].astype(str).to_numpy()
+            fmt_cash = recent_cash['cash_usd'].map('${:,.0f}'.format).to_numpy()
+            changes = recent_cash['cash_usd'].diff().fillna(0)
+            fmt_change = changes.map(lambda c: f"${c:,.0f}" if c != 0 else "$0").to_numpy()
+            cash_table_data += list(map(list, zip(months, fmt_cash, fmt_change)))
             
             cash_table = Table(cash_table_data, colWidths=[1.5*inch, 2*inch, 1.5*inch])
-            cash_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
+            cash_table.setStyle(_table_style('#2E86AB'))
             
             story.append(cash_table)
             story.append(Spacer(1, 20))
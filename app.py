@@ -7,8 +7,10 @@ from agent.cfo_agent import CFOAgent
 from agent.pdf_exporter import PDFExporter
 import os
 import re
-import base64
-import streamlit.components.v1 as components
+
+# Markdown **bold** spans and "• " bullet lines in agent responses
+_BOLD_RE = re.compile(r"\*\*(.*?)\*\*")
+_BULLET_RE = re.compile(r"^[ \t]*• ", re.MULTILINE)
 
 # Page configuration
 st.set_page_config(
@@ -55,6 +57,10 @@ st.markdown("""
     }
     /* Prevent accidental italics from markdown/em */
     em { font-style: normal !important; }
+    /* Chat message spacing */
+    [data-testid="stChatMessage"] ul { margin: 0 0 8px 22px; padding: 0; }
+    [data-testid="stChatMessage"] li { margin: 6px 0; }
+    [data-testid="stChatMessage"] p { margin: 0 0 8px 0; }
 </style>
 """, unsafe_allow_html=True)
 
@@ -63,17 +69,57 @@ if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'agent' not in st.session_state:
     st.session_state.agent = None
+if 'exec_pdf_requested' not in st.session_state:
+    st.session_state.exec_pdf_requested = False
+if 'cash_pdf_requested' not in st.session_state:
+    st.session_state.cash_pdf_requested = False
 
 # Initialize agent
-@st.cache_resource
-def get_agent():
-    """Get or create the CFO agent"""
+@st.cache_resource(max_entries=2)
+def get_agent(mtime: float):
+    """Get or create the CFO agent for one version (mtime) of the data file"""
     try:
         return CFOAgent("data.xlsx")
     except Exception as e:
         st.error(f"Error initializing CFO Agent: {str(e)}")
         return None
 
+def _data_fingerprint() -> tuple:
+    """Cheap, stable key for the current contents of the data file"""
+    return (os.path.getmtime("data.xlsx") if os.path.exists("data.xlsx") else None,)
+
+@st.cache_data(show_spinner=False)
+def _cached_summary(mtime: float) -> dict:
+    """Latest monthly summary, computed once per data file mtime"""
+    return get_agent(mtime).data_loader.get_monthly_summary()
+
+@st.cache_data(show_spinner=False)
+def _cached_runway(mtime: float) -> dict:
+    """Cash runway, computed once per data file mtime"""
+    return get_agent(mtime).data_loader.get_cash_runway()
+
+@st.cache_data(show_spinner=False)
+def _build_exec_pdf(fingerprint: tuple) -> bytes:
+    """Build the executive summary PDF once per data fingerprint"""
+    mtime = fingerprint[0]
+    agent = get_agent(mtime)
+    pdf_exporter = PDFExporter(agent.data_loader, agent.analyzer)
+    return pdf_exporter.export_executive_summary(summary=_cached_summary(mtime), runway=_cached_runway(mtime))
+
+@st.cache_data(show_spinner=False)
+def _build_cash_pdf(fingerprint: tuple) -> bytes:
+    """Build the cash trend PDF once per data fingerprint"""
+    agent = get_agent(fingerprint[0])
+    pdf_exporter = PDFExporter(agent.data_loader, agent.analyzer)
+    return pdf_exporter.export_cash_trend_report(runway=_cached_runway(fingerprint[0]))
+
+def _to_html(content: str) -> str:
+    """Prepare a chat message for st.markdown; done once when the message is added"""
+    # Agent responses use "• " bullets; turn them into markdown list items and
+    # pre-render bold so Streamlit's emphasis rules can't misread it
+    text = _BULLET_RE.sub("- ", content)
+    return _BOLD_RE.sub(r"<strong>\1</strong>", text)
+
 # Main app
 def main():
     # Header
@@ -108,8 +154,9 @@ def main():
         st.header("📈 Key Metrics")
         if st.session_state.agent:
             try:
-                summary = st.session_state.agent.data_loader.get_monthly_summary()
-                runway_data = st.session_state.agent.data_loader.get_cash_runway()
+                mtime = _data_fingerprint()[0]
+                summary = _cached_summary(mtime)
+                runway_data = _cached_runway(mtime)
                 
                 st.metric("Revenue", f"${summary['revenue_actual']:,.0f}")
                 st.metric("Gross Margin", f"{summary['gross_margin_actual']:.1f}%")
@@ -121,31 +168,37 @@ def main():
         st.header("📄 Export Reports")
         if st.session_state.agent:
             try:
-                pdf_exporter = PDFExporter(st.session_state.agent.data_loader, st.session_state.agent.analyzer)
-                # Generate bytes on each render so the download URL stays valid
-                exec_bytes = pdf_exporter.export_executive_summary()
-                cash_bytes = pdf_exporter.export_cash_trend_report()
+                # PDFs are built only once requested, then rebuilt only when the data file changes
+                fingerprint = _data_fingerprint()
 
-                # Data URL link (works even when download managers intercept blob URLs)
-                exec_b64 = base64.b64encode(exec_bytes).decode("utf-8")
                 st.markdown("**Executive Summary**")
-                st.markdown(
-                    f"<a href='data:application/pdf;base64,{exec_b64}' download='cfo_executive_summary.pdf' target='_blank'>Open/Download</a>",
-                    unsafe_allow_html=True,
-                )
+                if st.button("Generate Executive Summary", key="gen_exec_pdf"):
+                    st.session_state.exec_pdf_requested = True
+                if st.session_state.exec_pdf_requested:
+                    st.download_button(
+                        "Download Executive Summary",
+                        data=_build_exec_pdf(fingerprint),
+                        file_name="cfo_executive_summary.pdf",
+                        mime="application/pdf",
+                        key="exec_pdf_dl",
+                    )
 
-                cash_b64 = base64.b64encode(cash_bytes).decode("utf-8")
                 st.markdown("**Cash Trend Report**")
-                st.markdown(
-                    f"<a href='data:application/pdf;base64,{cash_b64}' download='cfo_cash_trend_report.pdf' target='_blank'>Open/Download</a>",
-                    unsafe_allow_html=True,
-                )
+                if st.button("Generate Cash Trend Report", key="gen_cash_pdf"):
+                    st.session_state.cash_pdf_requested = True
+                if st.session_state.cash_pdf_requested:
+                    st.download_button(
+                        "Download Cash Trend Report",
+                        data=_build_cash_pdf(fingerprint),
+                        file_name="cfo_cash_trend_report.pdf",
+                        mime="application/pdf",
+                        key="cash_pdf_dl",
+                    )
             except Exception as e:
                 st.error(f"PDF export error: {str(e)}")
     
-    # Initialize agent
-    if st.session_state.agent is None:
-        st.session_state.agent = get_agent()
+    # Initialize agent; a new data file mtime gets a new agent (and loader)
+    st.session_state.agent = get_agent(_data_fingerprint()[0])
     
     if st.session_state.agent is None:
         st.error("Failed to initialize CFO Agent. Please check your data file.")
@@ -154,52 +207,17 @@ def main():
     # Chat interface
     st.header("💬 Ask Your CFO Questions")
     
-    # Display chat messages
-    def render_message(content: str):
-        # Convert a limited subset of our markdown to HTML to avoid Streamlit's markdown quirks
-        lines = content.split("\n")
-        # Basic styling for dark theme readability
-        html_parts = [
-            """
-            <div class='msg' style="color:#e6eef2;font-size:16px;line-height:1.6;">
-            <style>
-            .msg ul{margin:0 0 8px 22px;padding:0}
-            .msg li{margin:6px 0}
-            .msg p{margin:0 0 8px 0}
-            .msg strong{color:#e6eef2}
-            </style>
-            """
-        ]
-        in_ul = False
-        bold = re.compile(r"\*\*(.*?)\*\*")
-        for line in lines:
-            if line.strip().startswith("• "):
-                if not in_ul:
-                    html_parts.append("<ul>")
-                    in_ul = True
-                text = line.strip()[2:]
-                text = text.replace("&nbsp;", "&nbsp;")
-                text = bold.sub(r"<strong>\1</strong>", text)
-                html_parts.append(f"<li>{text}</li>")
-            elif line.strip() == "":
-                if in_ul:
-                    html_parts.append("</ul>")
-                    in_ul = False
-                html_parts.append("<div style='height:6px'></div>")
-            else:
-                text = bold.sub(r"<strong>\1</strong>", line)
-                html_parts.append(f"<p>{text}</p>")
-        if in_ul:
-            html_parts.append("</ul>")
-        html_parts.append("</div>")
-        html = "".join(html_parts)
-        # Heuristic height so content is visible without cutting off
-        est_height = min(900, max(220, 28 * (len([l for l in lines if l.strip()]) + 3)))
-        components.html(html, height=est_height, scrolling=True)
+    # Display chat messages, reusing the markup rendered when each agent response was added
+    def render_message(html: str):
+        st.markdown(html, unsafe_allow_html=True)
 
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
-            render_message(message["content"]) 
+            # Only agent responses carry markup; user prompts and errors stay plain markdown
+            if "html" in message:
+                render_message(message["html"])
+            else:
+                st.markdown(message["content"])
             if "chart" in message and message["chart"] is not None:
                 st.plotly_chart(message["chart"], use_container_width=True)
     
@@ -217,9 +235,10 @@ def main():
             with st.spinner("Analyzing your data..."):
                 try:
                     response, chart = st.session_state.agent.process_query(prompt)
+                    response_html = _to_html(response)
                     
                     # Display response
-                    render_message(response)
+                    render_message(response_html)
                     
                     # Display chart if available
                     if chart is not None:
@@ -229,6 +248,7 @@ def main():
                     st.session_state.messages.append({
                         "role": "assistant", 
                         "content": response,
+                        "html": response_html,
                         "chart": chart
                     })
                     
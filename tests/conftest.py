@@ -0,0 +1,19 @@
+"""
+Shared fixtures for CFO Copilot tests
+"""
+import pytest
+import os
+import sys
+
+# Add parent directory to path for imports
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+from agent.data_loader import FinancialDataLoader
+
+@pytest.fixture(scope="session", autouse=True)
+def _cache_xlsx_as_parquet():
+    """Parse data.xlsx once per session so every loader after it reads the Parquet cache"""
+    loader = FinancialDataLoader(os.path.join(ROOT_DIR, "data.xlsx"))
+    if loader.cache_dir and not os.path.isdir(loader.cache_dir):
+        loader.load_all_data()
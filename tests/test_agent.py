@@ -5,6 +5,7 @@ import pytest
 import pandas as pd
 import numpy as np
 import os
+import shutil
 import sys
 
 # Add parent directory to path for imports
@@ -13,6 +14,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from agent.cfo_agent import CFOAgent
 from agent.intent_classifier import IntentClassifier, IntentType
 from agent.data_loader import FinancialDataLoader
+from agent.pdf_exporter import PDFExporter, REVENUE_RECS
+from agent.financial_analyzer import tier_label, runway_status
 
 class TestIntentClassifier:
     """Test intent classification functionality"""
@@ -43,6 +46,13 @@ class TestIntentClassifier:
         intent, params = self.classifier.classify("What is our cash runway right now?")
         assert intent == IntentType.CASH_RUNWAY
     
+    def test_triggers_cover_patterns(self):
+        """Test that every intent pattern contains one of its trigger words"""
+        for intent_type, patterns in self.classifier.patterns.items():
+            triggers = self.classifier._triggers[intent_type]
+            for pattern in patterns:
+                assert any(word in pattern for word in triggers), pattern
+    
     def test_month_extraction(self):
         """Test month extraction from queries"""
         intent, params = self.classifier.classify("Show me January revenue")
@@ -54,8 +64,10 @@ class TestIntentClassifier:
 class TestDataLoader:
     """Test data loading functionality"""
     
-    def setup_method(self):
-        self.data_loader = FinancialDataLoader("data.xlsx")
+    @classmethod
+    def setup_class(cls):
+        # One workbook load shared by every test in the class
+        cls.data_loader = FinancialDataLoader("data.xlsx")
     
     def test_load_all_data(self):
         """Test loading all data sheets"""
@@ -71,6 +83,63 @@ class TestDataLoader:
         assert isinstance(data['cash'], pd.DataFrame)
         assert isinstance(data['fx'], pd.DataFrame)
     
+    def test_parquet_cache_round_trip(self, tmp_path):
+        """Test that a second loader reads the Parquet cache written by the first, and stale caches are pruned"""
+        data_file = tmp_path / "data.xlsx"
+        shutil.copy("data.xlsx", data_file)
+        stale_dir = tmp_path / ".cache" / "data.xlsx-1"
+        stale_dir.mkdir(parents=True)
+        
+        first = FinancialDataLoader(str(data_file)).load_all_data()
+        cache_dir = FinancialDataLoader(str(data_file)).cache_dir
+        assert os.path.isdir(cache_dir)
+        assert not stale_dir.exists()
+        assert os.stat(cache_dir).st_mode == os.stat(tmp_path / ".cache").st_mode
+        
+        second = FinancialDataLoader(str(data_file)).load_all_data()
+        assert set(second) == set(first)
+        for sheet_name, df in first.items():
+            pd.testing.assert_frame_equal(second[sheet_name], df)
+    
+    def test_uncacheable_sheet_still_loads(self, tmp_path):
+        """Test that a sheet Parquet can't store only skips caching instead of failing the load"""
+        data_file = tmp_path / "data.xlsx"
+        shutil.copy("data.xlsx", data_file)
+        with pd.ExcelWriter(data_file, engine="openpyxl", mode="a") as writer:
+            pd.DataFrame({'note': ['see memo', 2, 3]}).to_excel(writer, sheet_name='notes', index=False)
+        
+        loader = FinancialDataLoader(str(data_file))
+        assert 'notes' in loader.load_all_data()
+        assert not os.path.isdir(loader.cache_dir)
+        assert loader.get_monthly_summary() == self.data_loader.get_monthly_summary()
+    
+    def test_corrupt_parquet_cache_falls_back_to_workbook(self, tmp_path):
+        """Test that an unreadable Parquet cache is replaced by a fresh workbook read"""
+        data_file = tmp_path / "data.xlsx"
+        shutil.copy("data.xlsx", data_file)
+        loader = FinancialDataLoader(str(data_file))
+        os.makedirs(loader.cache_dir)
+        with open(os.path.join(loader.cache_dir, "actuals.parquet"), "wb") as f:
+            f.write(b"not parquet")
+        
+        assert loader.get_monthly_summary() == self.data_loader.get_monthly_summary()
+        assert FinancialDataLoader(str(data_file)).load_all_data().keys() == self.data_loader.load_all_data().keys()
+    
+    def test_failed_load_is_retried(self, monkeypatch):
+        """Test that a load failing partway leaves the loader unloaded rather than half-built"""
+        loader = FinancialDataLoader("data.xlsx")
+        build_aggregates = FinancialDataLoader.__dict__["_build_aggregates"]
+        
+        def fail_once(*args):
+            monkeypatch.setattr(FinancialDataLoader, "_build_aggregates", build_aggregates)
+            raise ValueError("boom")
+        
+        monkeypatch.setattr(FinancialDataLoader, "_build_aggregates", fail_once)
+        with pytest.raises(Exception, match="boom"):
+            loader.load_all_data()
+        
+        assert loader.get_monthly_summary() == self.data_loader.get_monthly_summary()
+    
     def test_get_monthly_summary(self):
         """Test monthly summary generation"""
         summary = self.data_loader.get_monthly_summary()
@@ -97,6 +166,12 @@ class TestDataLoader:
             for col in required_columns:
                 assert col in opex_breakdown.columns
     
+    def test_cash_sorted_by_month(self):
+        """Test that the cached cash sheet is sorted by month at load"""
+        cash = self.data_loader.get_cash()
+        assert cash['month'].is_monotonic_increasing
+        assert cash.index.equals(pd.RangeIndex(len(cash)))
+    
     def test_get_cash_runway(self):
         """Test cash runway calculation"""
         runway_data = self.data_loader.get_cash_runway()
@@ -109,8 +184,9 @@ class TestDataLoader:
 class TestCFOAgent:
     """Test main CFO Agent functionality"""
     
-    def setup_method(self):
-        self.agent = CFOAgent("data.xlsx")
+    @classmethod
+    def setup_class(cls):
+        cls.agent = CFOAgent("data.xlsx")
     
     def test_process_revenue_query(self):
         """Test processing revenue vs budget query"""
@@ -147,6 +223,30 @@ class TestCFOAgent:
         assert "months" in response
         assert chart is not None
     
+    def test_agents_share_data_loader(self):
+        """Test that agents on the same data file share one loader"""
+        assert CFOAgent("data.xlsx").data_loader is self.agent.data_loader
+    
+    def test_repeated_query_is_cached(self):
+        """Test that a repeated query (ignoring case/whitespace) reuses the cached result"""
+        first = self.agent.process_query("What is our cash runway?")
+        second = self.agent.process_query("  what is our CASH runway?  ")
+        
+        assert second is first
+    
+    def test_failed_query_is_not_cached(self, monkeypatch):
+        """Test that an error response is recomputed once the underlying failure clears"""
+        def fail(*args, **kwargs):
+            raise ValueError("data file unreadable")
+        
+        monkeypatch.setattr(self.agent.data_loader, "get_monthly_summary", fail)
+        response, chart = self.agent.process_query("Overview, please")
+        assert "data file unreadable" in response
+        
+        monkeypatch.undo()
+        response, chart = self.agent.process_query("Overview, please")
+        assert "Financial Overview" in response
+    
     def test_process_general_query(self):
         """Test processing general query"""
         response, chart = self.agent.process_query("Give me an overview")
@@ -156,5 +256,43 @@ class TestCFOAgent:
         # General queries might not have charts
         assert chart is None or chart is not None
 
+class TestPDFExporter:
+    """Test PDF export functionality"""
+    
+    @classmethod
+    def setup_class(cls):
+        agent = CFOAgent("data.xlsx")
+        cls.data_loader = agent.data_loader
+        cls.exporter = PDFExporter(agent.data_loader, agent.analyzer)
+    
+    def test_export_executive_summary(self):
+        """Test executive summary export, with and without precomputed data, on both layout paths"""
+        pdf_bytes = self.exporter.export_executive_summary()
+        assert pdf_bytes.startswith(b"%PDF")
+        
+        pdf_bytes = self.exporter.export_executive_summary(
+            summary=self.data_loader.get_monthly_summary(),
+            runway=self.data_loader.get_cash_runway(),
+            opex=self.data_loader.get_opex_breakdown()
+        )
+        assert pdf_bytes.startswith(b"%PDF")
+        
+        pdf_bytes = self.exporter.export_executive_summary(use_canvas=False)
+        assert pdf_bytes.startswith(b"%PDF")
+    
+    def test_tier_boundaries(self):
+        """Test that tier lookups keep the original inclusive/exclusive bounds"""
+        assert runway_status(12) == "🟡 Monitor"
+        assert runway_status(12.1) == "🟢 Healthy"
+        assert runway_status(0) == "🔴 Critical"
+        assert tier_label(REVENUE_RECS, 5) == 'Maintain current revenue levels'
+        assert tier_label(REVENUE_RECS, -5) == 'Maintain current revenue levels'
+        assert tier_label(REVENUE_RECS, -5.1) == 'Focus on revenue growth initiatives'
+    
+    def test_export_cash_trend_report(self):
+        """Test cash trend report export"""
+        pdf_bytes = self.exporter.export_cash_trend_report(runway=self.data_loader.get_cash_runway())
+        assert pdf_bytes.startswith(b"%PDF")
+
 if __name__ == "__main__":
     pytest.main([__file__])